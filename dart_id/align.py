@@ -54,16 +54,22 @@ def get_exec_name(model):
 
 def align(dfa, config):
 
-  # take subset of confident observations to use for alignment
-  dff = dfa[-(dfa['exclude'])].reset_index(drop=True)
+  # take subset of confident observations to use for alignment.
+  # if no observations are excluded, then only take a shallow copy
+  # instead of copying every row with the boolean index
+  exclude = dfa['exclude'].values
+  if exclude.any():
+    dff = dfa[~exclude].reset_index(drop=True)
+  else:
+    dff = dfa.copy(deep=False)
+    dff.index = pd.RangeIndex(dff.shape[0])
 
   #logger.info('{} / {} ({:.2%}) confident, alignable observations (PSMs) after filtering.'.format(dff.shape[0], dfa.shape[0], dff.shape[0] / dfa.shape[0]))
 
   # refactorize peptide id into stan_peptide_id, 
   # to preserve continuity when feeding data into STAN
-  dff['stan_peptide_id'] = dff['sequence'].map({
-      ind: val for val, ind in enumerate(dff['sequence'].unique())
-  })
+  # (order of first appearance, same as enumerating the unique sequences)
+  dff['stan_peptide_id'] = pd.factorize(dff['sequence'])[0]
 
   exp_names = np.sort(dff['raw_file'].unique())
   num_experiments = len(exp_names)
@@ -72,17 +78,18 @@ def align(dfa, config):
   
   logger.info('Building peptide-experiment pairs...')
 
-  # build a unique peptide-experiment ID
-  pep_exp_all = dff['stan_peptide_id'].map(str) + ' - ' + dff['exp_id'].map(str)
-  pep_exp_pairs = pep_exp_all.unique()
-  num_pep_exp_pairs = len(pep_exp_pairs)
+  # build a unique peptide-experiment ID, by combining the integer
+  # peptide and experiment IDs into one key
+  num_exp_ids = dff['exp_id'].max() + 1
+  pep_exp_all = dff['stan_peptide_id'].values.astype(np.int64) * num_exp_ids + dff['exp_id'].values
 
   # muij_map - maps pair ID back to dataframe index
-  muij_map = pep_exp_all.map({ind: val for val, ind in enumerate(pep_exp_pairs)})
+  # pair IDs are numbered by the order in which they first appear
+  muij_map, pep_exp_pairs = pd.factorize(pep_exp_all)
+  num_pep_exp_pairs = len(pep_exp_pairs)
   # maps to experiment and peptide ID
-  splt = pd.Series(pep_exp_pairs).str.split(' - ')
-  muij_to_pep = splt.str.get(0).map(int)
-  muij_to_exp = splt.str.get(1).map(int)
+  muij_to_pep = pep_exp_pairs // num_exp_ids
+  muij_to_exp = pep_exp_pairs % num_exp_ids
 
   logger.info('{} peptide-experiment pairs.'.format(num_pep_exp_pairs))
 
@@ -337,7 +344,7 @@ def main():
     init_logger(config['verbose'], os.path.join(config['output'], 'align.log'), config['log_file'])
 
     logger.info('Converting files and filtering PSMs')
-    df, df_original = process_files(config)
+    df, df_original = process_files(config, keep_original_columns=False)
     logger.info('Finished converting files and filtering PSMs.')
 
     logger.info('Beginning alignment procedure')
@@ -26,7 +26,7 @@ def main():
     init_logger(args.verbose, '', log_to_file=False)
     logger = logging.getLogger('root')
 
-    df = pd.DataFrame()
+    dfs = []
 
     # iterate through each input file provided.
     for i, f in enumerate(args.input):
@@ -45,11 +45,12 @@ def main():
         # we need to split these observations up by input file in the future we can do so
         dfa['input_id'] = i
 
-        # append a copy of dfa into df, because the conversion process will heavily
-        # modify dfa. we need to keep a copy of the original dataframe in order to append
-        # the new columns back onto it later.
-        # re-index columns with '[dfa.columns.tolist()]' to preserve the general column order
-        df = df.append(dfa)[dfa.columns.tolist()]
+        # collect the input files and concatenate them once at the end, instead of
+        # appending (and copying the whole dataframe) once per input file
+        dfs.append(dfa)
+
+    # re-index columns with '[dfa.columns.tolist()]' to preserve the general column order
+    df = pd.concat(dfs, ignore_index=True, sort=False)[dfa.columns.tolist()]
 
     logger.info('Raw files:')
     logger.info(df[args.raw_file_col].unique())
@@ -58,14 +59,17 @@ def main():
         if len(args.include) == 0:
             raise Exception('Experiment inclusion expression by raw file name provided, but expression is defined incorrectly.')
         else:
-            # see if any raw file names match the user-provided expression
-            include_exps = list(filter(lambda x: re.search(r'' + args.include + '', x), df[args.raw_file_col].unique()))
+            # see if any raw file names match the user-provided expression.
+            # compile it once, and only match it against the unique raw file names
+            pattern = re.compile(args.include)
+            include_exps = [x for x in df[args.raw_file_col].unique() if pattern.search(x)]
 
             logger.info('{} raw files match the inclusion expression \"{}\"'.format(len(include_exps), args.include))
             logger.info(include_exps)
-            logger.info('Retaining {} observations out of {} total'.format(np.sum(df[args.raw_file_col].isin(include_exps)), df.shape[0]))
 
             include_exps = df[args.raw_file_col].isin(include_exps).values
+            logger.info('Retaining {} observations out of {} total'.format(np.sum(include_exps), df.shape[0]))
+
             df = df.loc[include_exps].reset_index(drop=True)
 
     # if combining input files, then write to one combined file
@@ -11,53 +11,93 @@ import os
 import pandas as pd
 import re
 
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 from sklearn import svm
 from sklearn.preprocessing import label_binarize, StandardScaler
 from sklearn.metrics import roc_curve, auc
 from sklearn.model_selection import train_test_split
 
-from functools import reduce
 from dart_id.exceptions import ConfigFileError, FilteringError
 from dart_id.helper import add_global_args, read_config_file, init_logger, pep_to_fdr
 
+# pyahocorasick is optional. if it is available, use it to match the UniProt
+# exclusion list in one pass over each protein string, instead of a regex
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# pyarrow is optional. if it is available, use its multithreaded CSV parser
+# and writer to read in the input files and write out the output files
+try:
+    import pyarrow
+    from pyarrow import csv as pacsv
+    from pyarrow import compute as pc
+except ImportError:
+    pyarrow = None
+
 logger = logging.getLogger('root')
 
-# all filter funcs take in the df, config object, and the filter object
-# as inputs, and output the filter vector (True/False), where True means
-# to filter out that particular row
+# all filter funcs take in the df, config object, the filter object, and the
+# filter context (see filter_context) as inputs, and output the filter vector
+# (True/False), where True means to filter out that particular row
+
+def filter_context(df):
+    """
+    Numpy views of the data frame columns that the filters use, taken once
+    and shared between all filters
+    """
+
+    ctx = {
+        'retention_time': df['retention_time'].values,
+        'raw_file_codes': df['raw_file'].cat.codes.values,
+        'sequence_codes': df['sequence'].cat.codes.values,
+        'num_sequences': len(df['sequence'].cat.categories)
+    }
+    for col in ['retention_length', 'proteins']:
+        if col in df.columns:
+            ctx[col] = df[col].values
+
+    return ctx
+
+def max_rt_per_psm(df, ctx):
+    """
+    Max RT (the run-time) of the raw file of each PSM. Only computed once,
+    for all dynamic filters
+    """
+
+    if 'max_rt' not in ctx:
+        ctx['max_rt'] = df.groupby('raw_file', observed=True)['retention_time'].transform('max').values
+    return ctx['max_rt']
 
-def filter_exclude_filename(df, config, _filter):
+def filter_exclude_filename(df, config, _filter, ctx):
     # see if any raw file names match the user-provided expression
-    exclude_exps = list(filter(
-        lambda x: re.search(r'' + _filter['expr'] + '', x), 
-        df['raw_file'].unique()
-    ))
-    # remove excluded rows from the sparse dataframe,
-    # but keep them in the original data frame, so that we can stitch together
-    # the final output later
-    exclude_exps = df['raw_file'].isin(exclude_exps).values
-    df = df[~exclude_exps]
+    # compile the expression once and match it against the whole column.
+    # excluded rows are kept in the original data frame, so that we can
+    # stitch together the final output later
+    pat = re.compile(_filter['expr'])
+    exclude_exps = df['raw_file'].str.contains(pat, na=False).values
     logger.info('Filtering out {} observations matching \"{}\"'.format(np.sum(exclude_exps), _filter['expr']))
 
     return exclude_exps
 
-def filter_include_filename(df, config, _filter):
+def filter_include_filename(df, config, _filter, ctx):
     # get matches for this expression
-    include_exps = list(filter(
-        lambda x: re.search(r'' + _filter['expr'] + '', x), 
-        df['raw_file'].unique()
-    ))
     # only keep rows that are in these raw file matches
-    include_exps = df['raw_file'].isin(include_exps).values
-    df = df[include_exps]
+    pat = re.compile(_filter['expr'])
+    include_exps = df['raw_file'].str.contains(pat, na=False).values
     logger.info('Keeping {} observations out of {} matching inclusion expression \"{}\"'.format(np.sum(include_exps), df.shape[0], _filter['expr']))
 
     # filter out the opposite of the included experiments
     return ~include_exps
 
-def filter_uniprot_exclusion_list(df, config, _filter):
+def uniprot_exclusion_pattern(_filter, log=logger.info):
     """
-    Filter proteins from exclusion list using UniProt IDs
+    Load the UniProt IDs of the exclusion list, which are matched literally
+    against the proteins column. Messages are passed to log, which is the
+    logger by default
     """
 
     exclusion_list = []
@@ -73,9 +113,9 @@ def filter_uniprot_exclusion_list(df, config, _filter):
         # open the exclusion list file and read in the UniProt IDs, line by line
         try:
             with open(_filter['file'], 'r') as f:
-                logger.info('Loading UniProt IDs from exclusion list file {} ...'.format(_filter['file']))
+                log('Loading UniProt IDs from exclusion list file {} ...'.format(_filter['file']))
                 exclusion_list = [line.rstrip('\n') for line in f]
-                logger.info('Loaded {} proteins from exclusion list.'.format(len(exclusion_list)))
+                log('Loaded {} proteins from exclusion list.'.format(len(exclusion_list)))
         except EnvironmentError:
             error_msg = 'Exclusion list file {} not found. Please provide a path to a file with UniProt IDs separated by line'.format(_filter['file'])
             raise ConfigFileError(error_msg)
@@ -83,29 +123,59 @@ def filter_uniprot_exclusion_list(df, config, _filter):
     elif 'list' in _filter and len(_filter['list']) > 0:
         # load UniProt IDs from the configuration file
         exclusion_list = _filter['list']
-        logger.info('Loading {} UniProt IDs from exclusion list as defined in config file'.format(len(exclusion_list)))
+        log('Loading {} UniProt IDs from exclusion list as defined in config file'.format(len(exclusion_list)))
     else:
         error_msg = 'No exclusion list file or list of UniProt IDs provided. Please provide a path to a file with UniProt IDs separated by line with the \"file\" key, or provide a python list of UniProt IDs with the \"list\" key. If not using a UniProt ID exclusion list, then comment out the \"uniprot_exclusion\" key from the filter list.'
         raise ConfigFileError(error_msg)
 
-    # filter exclusion list
-    if len(exclusion_list) > 0:
-        logger.info('UniProt IDs from exclusion list: {}'.format(exclusion_list))
-
-        # we could only match the excluded IDs to the razor protein,
-        # but we can be more strict and match the blacklisted IDs to the entire protein
-        # string, containing all possible proteins
-        pat = reduce((lambda x, y: x + '|' + y), exclusion_list)
-        blacklist_filter = df['proteins'].str.contains(pat)
-        blacklist_filter[pd.isnull(blacklist_filter)] = False
-
-        logger.info('Filtering out {} PSMs from the exclusion list'.format(np.sum(blacklist_filter)))
-        return blacklist_filter
-    else:
+    if len(exclusion_list) == 0:
         error_msg = 'Exclusion list found and loaded, but no UniProt IDs found. Check the format of the file, or the list in the config file.'
         raise ConfigFileError(error_msg)
 
-def filter_contaminant(df, config, _filter):
+    log('UniProt IDs from exclusion list: {}'.format(exclusion_list))
+
+    return list(exclusion_list)
+
+def filter_uniprot_exclusion_list(df, config, _filter, ctx, matches=None):
+    """
+    Filter proteins from exclusion list using UniProt IDs
+    """
+
+    # we could only match the excluded IDs to the razor protein,
+    # but we can be more strict and match the blacklisted IDs to the entire protein
+    # string, containing all possible proteins.
+    # matches are passed in if the proteins column was already scanned for
+    # this filter, together with the other protein filters
+    if matches is None:
+        matches = scan_proteins(ctx, [uniprot_exclusion_pattern(_filter)])[0]
+
+    logger.info('Filtering out {} PSMs from the exclusion list'.format(np.sum(matches)))
+    return matches
+
+def contaminant_pattern(_filter, log=logger.info):
+    """
+    Contaminant tag to match against the proteins column. Only use a regex
+    if the tag has any special characters in it. Takes log like
+    uniprot_exclusion_pattern, but there is nothing to log here
+    """
+
+    CON_TAG = _filter['tag']
+    if re.escape(CON_TAG) != CON_TAG:
+        return re.compile(CON_TAG)
+    return [CON_TAG]
+
+def parse_time_contaminant_tag(config):
+    """
+    Contaminant tag that can already be matched while reading in the input
+    files, or None. Only for a single contaminant filter with a literal tag
+    """
+
+    tags = [f['tag'] for f in config['filters'] if f['name'] == 'contaminant']
+    if len(tags) != 1 or not isinstance(contaminant_pattern({'tag': tags[0]}), list):
+        return None
+    return tags[0]
+
+def filter_contaminant(df, config, _filter, ctx, matches=None):
     """
     Filter contaminants, as marked by the search engine
     Looking for a contaminant tag in the leading_protein column
@@ -114,14 +184,16 @@ def filter_contaminant(df, config, _filter):
     # load the tag in from the config file
     CON_TAG = _filter['tag']
 
-    # search for the tag in the 'proteins' column
-    filter_con = df['proteins'].str.contains(CON_TAG)
-    filter_con[pd.isnull(filter_con)] = False
+    # search for the tag in the 'proteins' column, unless it was already
+    # scanned for this filter, together with the other protein filters
+    # only use a regex if the tag has any special characters in it
+    if matches is None:
+        matches = df['proteins'].str.contains(CON_TAG, regex=(re.escape(CON_TAG) != CON_TAG), na=False).values
 
-    logger.info('Filtering out {} PSMs as contaminants with tag \"{}\"'.format(np.sum(filter_con), CON_TAG))
-    return filter_con
+    logger.info('Filtering out {} PSMs as contaminants with tag \"{}\"'.format(np.sum(matches), CON_TAG))
+    return matches
 
-def filter_decoy(df, config, _filter):
+def filter_decoy(df, config, _filter, ctx):
     """
     Filter decoys, as marked by the search engine
     Looking for a decoy tag in the leading_protein column
@@ -131,13 +203,13 @@ def filter_decoy(df, config, _filter):
     REV_TAG = _filter['tag']
 
     # search for the tag in the 'leading protein' column
-    filter_rev = df['leading_protein'].str.contains(REV_TAG)
-    filter_rev[pd.isnull(filter_rev)] = False
+    # only use a regex if the tag has any special characters in it
+    filter_rev = df['leading_protein'].str.contains(REV_TAG, regex=(re.escape(REV_TAG) != REV_TAG), na=False).values
 
     logger.info('Filtering out {} PSMs as decoys with tag \"{}\"'.format(np.sum(filter_rev), REV_TAG))
     return filter_rev
 
-def filter_retention_length(df, config, _filter):
+def filter_retention_length(df, config, _filter, ctx):
     """
     Filter by retention length, which is a measure of the peak width
     during chromatography.
@@ -149,26 +221,22 @@ def filter_retention_length(df, config, _filter):
 
         logger.info('Using dynamic retention length of {} * run-time (max RT) for each experiment'.format(_filter['value']))
 
-        # get the max RT for each raw file, reindex to the same dimension as the
+        # get the max RT for each raw file, broadcast to the same dimension as the
         # retention_length column, and then multiply by the filter value
-        max_rts = df.groupby('raw_file')['retention_time'].max().values
-        
-        filter_rtl = max_rts[df['raw_file'].map({ 
-          ind: val for val, ind in enumerate(np.sort(df['raw_file'].unique()))
-        })] * _filter['value']
+        filter_rtl = max_rt_per_psm(df, ctx) * _filter['value']
 
-        filter_rtl = (df['retention_length'] > filter_rtl)
+        filter_rtl = (ctx['retention_length'] > filter_rtl)
 
     else:
         # use a constant filter for the retention length
         logger.info('Using constant retention length (in RT) of {} for all raw files.'.format(_filter['value']))
 
         # only allow values between 0 and max(RT)
-        if _filter['value'] <= 0 or _filter['value'] > np.max(df['retention_time']):
+        if _filter['value'] <= 0 or _filter['value'] > np.nanmax(ctx['retention_time']):
             error_msg = '\"retention_length filter\" {} is not defined or incorrectly defined. Please provide a decimal number between 0.0 and max(RT).'.format(_filter['value'])
             raise ConfigFileError(error_msg)
         
-        filter_rtl = (df['retention_length'] > _filter['value'])
+        filter_rtl = (ctx['retention_length'] > _filter['value'])
 
     if _filter['dynamic']:
         logger.info('Filtering out {} PSMs with retention length greater than {:.4f} * max(exp_RT) of each raw file.'.format(np.sum(filter_rtl), _filter['value']))
@@ -177,7 +245,7 @@ def filter_retention_length(df, config, _filter):
 
     return filter_rtl
 
-def filter_smears(df, config, _filter):
+def filter_smears(df, config, _filter, ctx):
     """
     Filter out "smears". even confidently identified PSMs can have bad chromatography,
     and in that case it is unproductive to include them into the alignment.
@@ -187,25 +255,35 @@ def filter_smears(df, config, _filter):
     """
 
     logger.info('Determining RT spread of peptides within each experiment...')
-    # for each experiment-peptide pair, get the range of retention times
-    # this is the step that could take a long time
-    # TODO: optimize this?
-    smears = df.groupby(['raw_file', 'sequence'])['retention_time'].apply(np.ptp)
-    
+    # for each experiment-peptide pair, get the range of retention times.
+    # instead of a (slow) per-group apply, combine the categorical codes of the
+    # (raw_file, sequence) pairs into integer keys, sort the retention times
+    # by key, and take the min/max over each contiguous run of the same key
+    rf_codes = ctx['raw_file_codes'].astype(np.int64)
+    seq_codes = ctx['sequence_codes'].astype(np.int64)
+    # missing raw files or sequences do not belong to any group
+    valid = (rf_codes >= 0) & (seq_codes >= 0)
+    keys = np.where(valid, rf_codes * ctx['num_sequences'] + seq_codes, -1)
+
+    order = np.argsort(keys, kind='stable')
+    rts = ctx['retention_time'][order]
+    new_group = np.diff(keys[order]) != 0
+    starts = np.concatenate(([0], np.flatnonzero(new_group) + 1))
+    ptp = np.maximum.reduceat(rts, starts) - np.minimum.reduceat(rts, starts)
+
+    # group of each PSM, in the original order of the data frame
+    codes = np.empty(len(keys), dtype=np.int64)
+    codes[order] = np.concatenate(([0], np.cumsum(new_group)))
+
     if _filter['dynamic']:
         # use the dynamic filter, where the value is a proportion
         # of the max RT (the run-time) of that raw file
 
         logger.info('Using dynamic smear length (in RT) of {:.4f} * run-time (max RT) for each experiment'.format(_filter['value']))
 
-        max_rts = df.groupby('raw_file')['retention_time'].max().values
-
-        smear_pair_inds = smears.index.to_frame()['raw_file'].values
-        smear_pair_inds = pd.Series(smear_pair_inds).map({
-          ind: val for val, ind in enumerate(np.sort(df['raw_file'].unique())) })
-
-        # get the (raw_file, sequence) tuples for PSMs with a range above the threshold
-        smears = smears[smears > (max_rts[smear_pair_inds] * _filter['value'])].index.values
+        # get the max RT of the raw file of each PSM, and take it
+        # from the first PSM of each group
+        thresholds = max_rt_per_psm(df, ctx)[order[starts]] * _filter['value']
 
     else:
         # use a constant filter for the retention length
@@ -215,18 +293,18 @@ def filter_smears(df, config, _filter):
             error_msg = 'Smear filter {:.4f} is not defined or incorrectly defined. Please provide a decimal number between 0.0 and max(RT).'.format(_filter['value'])
             raise ConfigFileError(error_msg)
 
-        # get the (exp_id, peptide_id) tuples for PSMs with a range above the threshold
-        smears = smears[smears > _filter['value']].index.values
-    
-    # map the tuples back to the original data frame, and set smears to be excluded
-    smears = pd.Series(list(zip(df['raw_file'], df['sequence']))).isin(smears)
+        thresholds = np.repeat(_filter['value'], len(ptp))
+
+    # flag the groups with a range above the threshold, then map the
+    # flags back to the original data frame with the group codes
+    smears = (ptp > thresholds)[codes] & valid
 
     if _filter['dynamic']:
-        logger.info('Filtering out {} PSMs with an intra-experiment RT spread greater than {:.4f} * max(exp_RT) for each raw file.'.format(smears.sum(), _filter['value']))
+        logger.info('Filtering out {} PSMs with an intra-experiment RT spread greater than {:.4f} * max(exp_RT) for each raw file.'.format(np.sum(smears), _filter['value']))
     else:
-        logger.info('Filtering out {} PSMs with an intra-experiment RT spread greater than {:.4f}'.format(smears.sum(), _filter['value']))
+        logger.info('Filtering out {} PSMs with an intra-experiment RT spread greater than {:.4f}'.format(np.sum(smears), _filter['value']))
 
-    return smears.values
+    return smears
 
 # dictionary of all filter functions
 filter_funcs = {
@@ -239,6 +317,14 @@ filter_funcs = {
     'smears': filter_smears
 }
 
+# filters that only search the proteins column. if more than one of them is
+# used, the column is scanned once for all of them. each of these returns the
+# pattern to search for, as either a list of literal strings or a compiled regex
+protein_patterns = {
+    'uniprot_exclusion': uniprot_exclusion_pattern,
+    'contaminant': contaminant_pattern
+}
+
 # columns required for each filter to run
 # will skip the filter if this column does not exist in the input file
 required_cols = {
@@ -272,13 +358,166 @@ def convert(df, config):
         cols.append(config['col_names'][col])
         col_names.append(col)
 
-    # take the subset of the input file, and also rename the columns
-    dfa = df[cols]
-    dfa.columns = col_names
+    # take the subset of the input file, and also rename the columns.
+    # build a new data frame out of the columns' numpy arrays, so that it
+    # does not carry along the block structure of the (much wider) input file.
+    # don't copy the arrays here. the frames of all input files are
+    # concatenated (and copied) in process_files afterwards anyways
+    dfa = pd.DataFrame({
+        col_name: df[col].to_numpy()
+        for col, col_name in zip(cols, col_names)
+    }, index=df.index, copy=False)
 
     return dfa
 
 
+def read_input_file(f, config, usecols=None):
+    # if a list of columns is given, only parse those columns, and skip the rest.
+    # columns that do not exist in the file are left to the conversion
+    # to complain about
+
+    # use pyarrow's CSV reader if it is available. it parses the file in blocks
+    # with multiple threads, and does not need pandas' low memory type inference.
+    # parse empty strings as missing values, like pandas does.
+    # pyarrow only takes a single character as the delimiter, so leave
+    # separators like '\s+' to pandas
+    if pyarrow is not None and len(config['sep']) == 1:
+        try:
+            parse_options = pacsv.ParseOptions(delimiter=config['sep'])
+            convert_options = pacsv.ConvertOptions(strings_can_be_null=True)
+            if usecols is not None:
+                convert_options.include_columns = usecols
+            tbl = pacsv.read_csv(f, parse_options=parse_options,
+                convert_options=convert_options)
+
+            # pandas renames repeated column names (e.g., 'Extra' -> 'Extra.1'),
+            # so read files with repeated column names with pandas instead
+            if len(set(tbl.column_names)) < len(tbl.column_names):
+                raise ValueError('repeated column names')
+
+            # pyarrow infers dates and timestamps, which pandas leaves as strings.
+            # read those columns in again as strings, so that the original data
+            # is written back out the same way it came in
+            temporal_cols = [field.name for field in tbl.schema
+                if pyarrow.types.is_temporal(field.type)]
+            if len(temporal_cols) > 0:
+                convert_options.column_types = {
+                    col: pyarrow.string() for col in temporal_cols}
+                tbl = pacsv.read_csv(f, parse_options=parse_options,
+                    convert_options=convert_options)
+
+            dfa = tbl.to_pandas()
+
+            # the contaminant tag can be matched on the arrow strings directly,
+            # which is a lot faster than going through the python strings later.
+            # the matches are moved to the converted data frame in read_and_convert
+            tag = parse_time_contaminant_tag(config)
+            proteins_col = config['col_names'].get('proteins')
+            if (
+                tag is not None and proteins_col is not None and
+                proteins_col in tbl.column_names and
+                pyarrow.types.is_string(tbl.schema.field(proteins_col).type)
+            ):
+                contaminants = pc.fill_null(pc.match_substring(tbl.column(proteins_col), tag), False)
+                dfa['__contaminant'] = contaminants.to_pandas().values
+
+            return dfa
+        except (pyarrow.ArrowException, ValueError) as e:
+            logger.debug('Could not read {} with pyarrow ({}). Falling back to pandas'.format(f, e))
+
+    if usecols is not None:
+        cols = set(usecols)
+        usecols = lambda col: col in cols
+
+    # have a variable low memory option depending on the input type.
+    # MaxQuant, for example, has a structure that forces pandas out of its
+    # optimal low memory mode, and we have to specify it here.
+    return pd.read_csv(f, sep=config['sep'], low_memory=config['low_memory'], usecols=usecols)
+
+def scan_proteins(ctx, patterns):
+    """
+    Search the proteins column for multiple patterns in a single pass, and
+    return a boolean vector for each pattern. Patterns are either lists of
+    literal strings, or compiled regexes
+    """
+
+    automaton = None
+    substrings = []
+    regexes = []
+    for k, pattern in enumerate(patterns):
+        if not isinstance(pattern, list):
+            regexes.append((1 << k, pattern))
+        elif len(pattern) <= 5:
+            # for only a handful of strings, plain substring checks are
+            # faster than both the automaton and a regex
+            substrings.append((1 << k, tuple(pattern)))
+        elif ahocorasick is not None:
+            # build a single automaton out of the literal strings of all patterns,
+            # so that each protein string is only scanned once. the value of each
+            # string are the bits of the patterns it belongs to
+            if automaton is None:
+                automaton = ahocorasick.Automaton()
+            for word in pattern:
+                automaton.add_word(word, automaton.get(word, 0) | (1 << k))
+        else:
+            # escape the strings, so that they are matched literally,
+            # and compile the alternation once for the whole column
+            regexes.append((1 << k, re.compile('|'.join(map(re.escape, pattern)))))
+
+    if automaton is not None:
+        automaton.make_automaton()
+
+    # get the bits of all patterns that match the protein string
+    def match(proteins):
+        bits = 0
+        for bit, words in substrings:
+            for word in words:
+                if word in proteins:
+                    bits |= bit
+                    break
+        if automaton is not None:
+            for _, word_bits in automaton.iter(proteins):
+                bits |= word_bits
+        for bit, pat in regexes:
+            if pat.search(proteins) is not None:
+                bits |= bit
+        return bits
+
+    hits = np.array([
+        match(proteins) if isinstance(proteins, str) else 0
+        for proteins in ctx['proteins']
+    ], dtype=np.int64)
+
+    # split the bits back up into one vector per pattern
+    return [(hits & (1 << k)) != 0 for k in range(len(patterns))]
+
+def write_output_file(df, out_path):
+    """
+    Write the data frame to a tab-separated file, without the index
+    """
+
+    # use pyarrow's CSV writer if it is available. it formats the values in
+    # batches with multiple threads, instead of cell by cell. keep the output
+    # close to what pandas writes: an unquoted header and values, and booleans
+    # as True/False. values that would need quoting fall back to pandas
+    if pyarrow is not None:
+        try:
+            tbl = pyarrow.Table.from_pandas(df, preserve_index=False)
+            for k, field in enumerate(tbl.schema):
+                if pyarrow.types.is_boolean(field.type):
+                    tbl = tbl.set_column(k, field.name, pc.if_else(tbl.column(k), 'True', 'False'))
+
+            with open(out_path, 'wb') as f:
+                f.write(('\t'.join(map(str, df.columns)) + '\n').encode('utf-8'))
+                pacsv.write_csv(tbl, f, write_options=pacsv.WriteOptions(
+                    include_header=False, delimiter='\t', quoting_style='none'))
+            return
+        except (pyarrow.ArrowException, AttributeError, TypeError, ValueError) as e:
+            # older versions of pyarrow do not have all the options used here
+            logger.debug('Could not write {} with pyarrow ({}). Falling back to pandas'.format(out_path, e))
+
+    df.to_csv(out_path, sep='\t', index=False)
+
 def filter_psms(df, config):
     logger.info('Filtering PSMs...')
 
@@ -296,107 +535,186 @@ def filter_psms(df, config):
                 error_msg = 'Filter {} required a data column {}, but this was not found in the input dataframe.'.format(f['name'], j)
                 raise ConfigFileError(error_msg)
 
-    # by default, filter out nothing. we'll use binary ORs (|) to
-    # gradually add more and more observations to this filter out blacklist
-    df['remove'] = np.repeat(False, df.shape[0])
+    # by default, filter out nothing. we'll use in-place binary ORs (|) to
+    # gradually add more and more observations to this filter out blacklist,
+    # and only assign it to the dataframe once all filters are done
+    remove = np.zeros(df.shape[0], dtype=bool)
+
+    # take the columns used by the filters only once
+    ctx = filter_context(df)
 
     # run all the filters specified by the list in the input config file
     # all filter functions are passed df, and the run configuration
     # after each filter, append it onto the exclusion master list with a bitwise OR
     # if the filter function returns None, then just ignore it.
+    #
+    # the contaminant filter is passed its matches if they were already found
+    # while reading in the input files. this is only the case if they were
+    # found for all input files, otherwise the column has missing values
+    parsed_matches = {}
+    if 'contaminant' in df.columns and df['contaminant'].dtype == bool:
+        parsed_matches['contaminant'] = df['contaminant'].values
+
+    # if more than one filter searches the proteins column, then scan the column
+    # for all of them once, before running the filters, and pass each its matches.
+    # the messages from building each pattern are held back until that filter's
+    # turn, so that they are logged in the same order as without the shared scan
+    protein_filters = [
+        i for i, f in enumerate(filters)
+        if f['name'] in protein_patterns and f['name'] not in parsed_matches
+    ]
+    protein_matches = {}
+    pattern_messages = {}
+    if len(protein_filters) > 1:
+        patterns = []
+        for i in protein_filters:
+            pattern_messages[i] = []
+            patterns.append(protein_patterns[filters[i]['name']](filters[i], log=pattern_messages[i].append))
+        protein_matches = dict(zip(protein_filters, scan_proteins(ctx, patterns)))
+
     for i, f in enumerate(filters):
-        e = filter_funcs[f['name']](df, config, f)
+        if f['name'] in parsed_matches:
+            e = filter_funcs[f['name']](df, config, f, ctx, matches=parsed_matches[f['name']])
+        elif i in protein_matches:
+            for message in pattern_messages[i]:
+                logger.info(message)
+            e = filter_funcs[f['name']](df, config, f, ctx, matches=protein_matches[i])
+        else:
+            e = filter_funcs[f['name']](df, config, f, ctx)
         if e is not None:
-            df['remove'] = (df['remove'] | e)
+            remove |= np.asarray(e, dtype=bool)
 
-    return df
+    df['remove'] = remove
 
-def process_files(config):
-
-    # create our output data frames
-    df_original = pd.DataFrame()
-    df = pd.DataFrame()
+    return df
 
-    # iterate through each input file provided.
-    for i, f in enumerate(config['input']):
-        # first expand user or any vars
-        f = os.path.expanduser(f)
-        f = os.path.expandvars(f)
-
-        logger.info('Reading in input file #{} | {} ...'.format(i+1, f))
-
-        # load the input file with pandas
-        # 
-        # have a variable low memory option depending on the input type.
-        # MaxQuant, for example, has a structure that forces pandas out of its
-        # optimal low memory mode, and we have to specify it here.
-        dfa = pd.read_csv(f, sep=config['sep'], low_memory=config['low_memory'])
-
-        # keep track of where observations came from. this is _not_ the raw file ID
-        # but instead the ID from which input file it originated from, so that if
-        # we need to split these observations up by input file in the future we can do so
-        dfa['input_id'] = i
-
-        # append a copy of dfa into df_original, because the conversion process will heavily
-        # modify dfa. we need to keep a copy of the original dataframe in order to append
-        # the new columns back onto it later.
-        # re-index columns with '[dfa.columns.tolist()]' to preserve the general column order
-        df_original = df_original.append(dfa, sort=True)[dfa.columns.tolist()]
-
-        # if this input data already has DART-ID columns in it, then drop them,
-        # since they cause problems later
-        dart_cols = ['rt_minus', 'rt_plus', 'mu', 'muij', 'sigmaij', 'pep_new', 'exp_id', 'peptide_id', 'stan_peptide_id', 'exclude', 'residual', 'pep_updated', 'q-value']
-        # print a warning if we see any
-        if np.any(df_original.columns.isin(dart_cols)):
-            logger.warning('Columns {} are recognized as DART-ID output columns. Removing these columns before proceeding. In the future, please input original input data files, not output files from DART-ID.'.format(np.array_str(df_original.columns[df_original.columns.isin(dart_cols)])))
-
-            # drop existing dart cols
-            for col in dart_cols:
-                if col in df_original.columns:
-                    logger.debug('Removing column {}'.format(col))
-                    df_original = df_original.drop(col, axis=1)
-
-        logger.info('Converting {} ({} PSMs)...'.format(f, dfa.shape[0]))
-
-        # convert - takes subset of columns and renames them
-        dfa = convert(dfa, config)
-
-        # need to reset the input_id after the conversion process
-        dfa['input_id'] = i
-        # append to master dataframe
-        df = df.append(dfa)
+def read_and_convert(i, f, config, usecols=None):
+    # first expand user or any vars
+    f = os.path.expanduser(f)
+    f = os.path.expandvars(f)
+
+    logger.info('Reading in input file #{} | {} ...'.format(i+1, f))
+
+    # load the input file, with pyarrow if it is available
+    dfa = read_input_file(f, config, usecols)
+
+    # contaminant matches from reading the file, if any.
+    # keep them out of the original data frame
+    contaminants = None
+    if '__contaminant' in dfa.columns:
+        contaminants = dfa.pop('__contaminant').values
+
+    # keep track of where observations came from. this is _not_ the raw file ID
+    # but instead the ID from which input file it originated from, so that if
+    # we need to split these observations up by input file in the future we can do so
+    dfa['input_id'] = i
+
+    logger.info('Converting {} ({} PSMs)...'.format(f, dfa.shape[0]))
+
+    # convert - takes subset of columns and renames them
+    # return dfa as well, because the conversion process will heavily
+    # modify dfa. we need to keep a copy of the original dataframe in order to append
+    # the new columns back onto it later.
+    dfc = convert(dfa, config)
+
+    # need to reset the input_id after the conversion process
+    dfc['input_id'] = i
+
+    if contaminants is not None:
+        dfc['contaminant'] = contaminants
+
+    return dfa, dfc
+
+def process_files(config, keep_original_columns=True):
+
+    # the original data frame is only needed in full to write the input files
+    # back out with the updated columns. otherwise, only read in the columns
+    # that are converted, which are usually a small subset of the input file
+    usecols = None
+    if not keep_original_columns:
+        usecols = [col for col in config['col_names'].values() if col is not None]
+
+    # input files are independent of each other until they are concatenated,
+    # so read and convert them in parallel, one process per input file.
+    # by default, use as many processes as there are input files, up to the number of CPUs
+    num_workers = config.get('num_workers') or os.cpu_count() or 1
+    num_workers = min(num_workers, len(config['input']))
+
+    if num_workers > 1:
+        logger.info('Reading in {} input files with {} processes'.format(len(config['input']), num_workers))
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            # map returns the results in the same order as the input files
+            results = list(executor.map(
+                read_and_convert,
+                range(len(config['input'])), config['input'], repeat(config), repeat(usecols)
+            ))
+    else:
+        results = [read_and_convert(i, f, config, usecols) for i, f in enumerate(config['input'])]
+
+    # collect the original and converted data frames of each input file
+    df_original = [dfa for dfa, _ in results]
+    df = [dfc for _, dfc in results]
+    del results
+
+    # concatenate all input files at once. columns are kept in the order in
+    # which they first appear, and the index is reset so that rows of different
+    # input files do not share the same index
+    df_original = pd.concat(df_original, ignore_index=True, sort=False)
+    df = pd.concat(df, ignore_index=True, sort=False)
+
+    # if this input data already has DART-ID columns in it, then drop them,
+    # since they cause problems later
+    dart_cols = ['rt_minus', 'rt_plus', 'mu', 'muij', 'sigmaij', 'pep_new', 'exp_id', 'peptide_id', 'stan_peptide_id', 'exclude', 'residual', 'pep_updated', 'q-value']
+    # print a warning if we see any
+    if np.any(df_original.columns.isin(dart_cols)):
+        logger.warning('Columns {} are recognized as DART-ID output columns. Removing these columns before proceeding. In the future, please input original input data files, not output files from DART-ID.'.format(np.array_str(df_original.columns[df_original.columns.isin(dart_cols)])))
+
+        # drop existing dart cols
+        for col in dart_cols:
+            if col in df_original.columns:
+                logger.debug('Removing column {}'.format(col))
+                df_original = df_original.drop(col, axis=1)
 
     # modify columns?
     # append the ion charge to the sequence
     # also make sure the charge column is specified and exists
     if config['add_charge_to_sequence'] and 'charge' in df.columns:
         logger.info('Appending charge to peptide sequence, to align different charge states separately.')
-        df['sequence'] = df['sequence'] + '_' + df['charge'].apply(str)
+        df['sequence'] = df['sequence'] + '_' + df['charge'].astype(str)
+
+    # raw files and sequences are only grouped and compared from here on,
+    # so store them as categoricals. their strings are hashed once here, and
+    # all groupbys and membership tests below work on the integer codes
+    df['raw_file'] = df['raw_file'].astype('category')
+    df['sequence'] = df['sequence'].astype('category')
 
     # create a unique ID for each PSM to help with stiching the final result together
     # after all of our operations
-    df['id'] = range(0, df.shape[0])
-    df_original['id'] = range(0, df.shape[0])
+    df['id'] = np.arange(df.shape[0], dtype=np.int32)
+    df_original['id'] = np.arange(df_original.shape[0], dtype=np.int32)
 
     # by default, exclude nothing from the original experiment
     df_original['remove'] = np.repeat(False, df_original.shape[0])
 
     # if the input already has an 'remove' column, then skip this step
-    if 'remove' in config['col_names'] and config['col_names']['remove'] is not None:
-        df['remove'] = df['remove'].astype(bool)
-    else: # otherwise, run the filters
+    if 'remove' not in config['col_names'] or config['col_names']['remove'] is None:
+        # otherwise, run the filters
         df = filter_psms(df, config)
 
+    # keep the removal flags out of the dataframe while we add to them below,
+    # and only assign them back once we're done filtering
+    remove = df.pop('remove').values.astype(bool)
+
     # apply non-optional filters, PEP threshold and requirement that
     # sequence is observed in at least n experiments (num_experiments)
     
     # remove any observations with null pep
     null_pep = pd.isnull(df['pep'])
     if np.sum(null_pep) > 0:
-        df['remove'] = ((df['remove']) | (null_pep))
+        remove |= null_pep.values
         logger.info('Removing {} PSMs with no PEP entry.'.format(np.sum(null_pep)))
 
-    num_exps = len(df['raw_file'].unique())
+    num_exps = df['raw_file'].nunique(dropna=False)
 
     # Special error when only one experiment is loaded
     if num_exps == 1:
@@ -410,74 +728,70 @@ def process_files(config):
     # Calculate FDR
     df['qval'] = pep_to_fdr(df['pep'])
     
-    # Count the number of experiments a peptide is observed in, but filter out
+    # Count the number of experiments a peptide is observed in with the
+    # categorical codes of the sequences and raw files.
+    # Missing sequences have a code of -1
+    seq_codes = df['sequence'].cat.codes.values
+    rf_codes = df['raw_file'].cat.codes.values
+
+    # Get all unique (sequence, raw file) pairs of confident PSMs, but filter out
     # 1) PSMs removed from previous filters
     # 2) PSMs with PEP > pep_threshold
-    exps_per_pep = (
-        df.loc[
-            # Get peptides that are:
-            (
-                # Not previously removed, for any reason
-                (~df['remove']) &
-                # Are below the set confidence threshold
-                (df['pep'] < config['pep_threshold'])
-                # (df['qval'] < config['pep_threshold']) # peptide FDR
-            ),
-            ['sequence', 'raw_file']
-        ]
-        # Group by sequence, get all unique raw files the peptide sequence 
-        # appears in, then count the number of raw files
-        .groupby('sequence')['raw_file']
-        .unique()
-        .apply(len)
+    confident = (
+        # Get peptides that are:
+        # Not previously removed, for any reason
+        (~remove) &
+        # Are below the set confidence threshold
+        (df['pep'].values < config['pep_threshold'])
+        # (df['qval'] < config['pep_threshold']) # peptide FDR
     )
-    # map values to DataFrame. peptides without any value will get NaN,
-    # which will then be assigned to 0.
-    exps_per_pep = df['sequence'].map(exps_per_pep)
-    exps_per_pep[pd.isnull(exps_per_pep)] = 0
+    pairs = pd.DataFrame({
+        'sequence': seq_codes[confident],
+        'raw_file': rf_codes[confident]
+    }).drop_duplicates()
+    pairs = pairs.loc[pairs['sequence'] >= 0]
+
+    # count the number of raw files for each sequence, and map counts back
+    # to the PSMs. peptides without any confident observations, or without
+    # a sequence, get 0
+    exps_per_seq = np.bincount(pairs['sequence'].values, minlength=len(df['sequence'].cat.categories))
+    exps_per_pep = np.where(seq_codes >= 0, exps_per_seq[seq_codes], 0)
 
     # flag these sequences for removal as well
     logger.info('Removing {} PSMs from peptide sequences not observed confidently in more than {} experiments'.format(np.sum(exps_per_pep < config['num_experiments']), config['num_experiments']))
-    df['remove'] = (df['remove'] | (exps_per_pep < config['num_experiments']))
+    # keep track of the peptides which passed this first count
+    passed_first_count = (exps_per_pep >= config['num_experiments'])
+    remove |= ~passed_first_count
 
     # check that every experiment has at least n PSMs available for alignment.
     # if not, then exclude them from alignment
-    psms_per_exp = df.groupby('raw_file')['remove'].apply(lambda x: np.sum(x < config['pep_threshold']))
-    exclude_exps = psms_per_exp.index.values[psms_per_exp < config['min_psms_per_experiment']]
+    # observed groups of categoricals come out in order of first appearance
+    # on older pandas, so sort them by raw file name, like the object column did
+    psms_per_exp = pd.Series(remove < config['pep_threshold']).groupby(df['raw_file'].values, observed=True).sum().sort_index()
+    exclude_exps = np.asarray(psms_per_exp.index)[psms_per_exp.values < config['min_psms_per_experiment']]
     
     if len(exclude_exps) > 0:
         logger.warning('Experiments {} have < {} confident PSMs (PEP < {}) remaining after filtering. All PSMs belonging to these experiments will be excluded from the retention time alignment'.format(np.array_str(exclude_exps), config['min_psms_per_experiment'], config['pep_threshold']))
 
-    # exclude experiments without enough PSMs
-    df['remove'] = (df['remove'] | df['raw_file'].isin(exclude_exps))
+    # exclude experiments without enough PSMs.
+    # compare the raw file codes, instead of hashing the raw file names again
+    exclude_codes = np.sort(df['raw_file'].cat.categories.get_indexer(exclude_exps))
+    remove |= np.isin(rf_codes, exclude_codes)
 
     # recalculate exps_per_pep, since we removed some experiments and this
     # number will change based on the set of experiments we consider
     logger.info('Recalculating number of confident peptides across experiments...')
 
-    exps_per_pep = (
-        df.loc[
-            # Get peptides that are:
-            (
-                # Not previously removed, for any reason
-                (~df['remove']) &
-                # Are below the set confidence threshold
-                (df['pep'] < config['pep_threshold'])
-            ),
-            ['sequence', 'raw_file']
-        ]
-        # Group by sequence, get all unique raw files the peptide sequence 
-        # appears in, then count the number of raw files
-        .groupby('sequence')['raw_file']
-        .unique()
-        .apply(len)
-    )
-    exps_per_pep = df['sequence'].map(exps_per_pep)
+    # instead of counting all confident pairs again, subtract the pairs of the
+    # excluded experiments from the counts. peptides flagged by the first count
+    # keep a count below the threshold, since their counts can only go down
+    exclude_pairs = pairs.loc[np.isin(pairs['raw_file'].values, exclude_codes)]
+    exps_per_seq -= np.bincount(exclude_pairs['sequence'].values, minlength=len(exps_per_seq))
+    exps_per_pep = np.where(seq_codes >= 0, exps_per_seq[seq_codes], 0)
 
-    logger.info('Additional {} PSMs from peptide sequences not observed confidently in more than {} experiments flagged for removal.'.format(np.sum(exps_per_pep < config['num_experiments']), config['num_experiments']))
+    logger.info('Additional {} PSMs from peptide sequences not observed confidently in more than {} experiments flagged for removal.'.format(np.sum(passed_first_count & (exps_per_pep > 0) & (exps_per_pep < config['num_experiments'])), config['num_experiments']))
 
-    exps_per_pep[pd.isnull(exps_per_pep)] = 0
-    df['remove'] = (df['remove'] | (exps_per_pep < config['num_experiments']))
+    remove |= (exps_per_pep < config['num_experiments'])
 
 
     # Exclude low-confidence PEPs from alignment (PEP > 0.01) if the 
@@ -485,30 +799,36 @@ def process_files(config):
     # We found that this is a good predictor of whether or not 
     # the PSM is a decoy hit versus a target hit.
 
-    def cv(x):
-        if len(x) < 3:
-            return np.nan
-        
-        return np.nanstd(x) / np.nanmean(x)
-
+    # only use built-in aggregations, which pandas can run without
+    # calling back into python for each peptide
     peptide_aggs = {
-        'pep_mean': ('pep', np.nanmean),
-        'pep_cv': ('pep', cv),
-        'pep_min': ('pep', np.min),
+        'pep_mean': ('pep', 'mean'),
+        'pep_std': ('pep', 'std'),
+        'pep_min': ('pep', 'min'),
         'num_obs': ('pep', 'count')
     }
 
+    # sort the peptides by sequence, like the object column did. observed groups
+    # come out in order of first appearance on older pandas, which would reorder
+    # the training data for the logistic regression below
+    peptides_df = df.groupby('sequence', observed=True).aggregate(**peptide_aggs).sort_index()
+
     # If we have the protein_decoy_tag and the leading_proteins column,
-    # Look for the protein_decoy_tag to determine whether or not the peptide is a decoy peptide
+    # Look for the protein_decoy_tag to determine whether or not the peptide is a decoy peptide.
+    # search all leading proteins for the tag at once, then check if any PSM of a peptide has it
     if 'leading_protein' in config['col_names'] and 'protein_decoy_tag' in config:
-        def is_decoy(x):
-            return x.str.contains(config['protein_decoy_tag']).any()
-
-        peptide_aggs['is_decoy'] = ('leading_protein', is_decoy)
-
-    peptides_df = (df
-        .groupby('sequence')
-        .aggregate(**peptide_aggs)
+        decoy_hits = df['leading_protein'].str.contains(config['protein_decoy_tag'], na=False).values
+        peptides_df['is_decoy'] = pd.Series(decoy_hits).groupby(df['sequence'].values, observed=True).any()
+
+    # CV of the PEPs, for peptides with at least 3 observations.
+    # scale the sample standard deviation to the population standard deviation
+    peptides_df['pep_cv'] = (
+        peptides_df['pep_std'] *
+        np.sqrt((peptides_df['num_obs'] - 1) / peptides_df['num_obs']) /
+        peptides_df['pep_mean']
+    ).where(peptides_df['num_obs'] >= 3)
+
+    peptides_df = (peptides_df
         # Only take peptides with more than N observations
         .query('num_obs > 3')
         # Remove any extremely low CVs
@@ -555,8 +875,9 @@ def process_files(config):
         
         # Maximize the Youden-Index (sensitivity (TP / P = TPR) + specificity (TN / N = 1 - FPR))
         # But set a MINIMUM TPR of 0.8. We don't want to cut out too many of our targets
-        cutoff_start_ind = np.argmax(tpr >= 0.8) # argmax gets the first ind of the max value
-        cutoff_ind = cutoff_start_ind + np.argmax(tpr[cutoff_start_ind:] - fpr[cutoff_start_ind:])
+        # TPR from roc_curve is non-decreasing, so binary search for the first ind with TPR >= 0.8
+        cutoff_start_ind = np.searchsorted(tpr, 0.8, side='left')
+        cutoff_ind = cutoff_start_ind + np.argmax(np.subtract(tpr[cutoff_start_ind:], fpr[cutoff_start_ind:]))
         cutoff_thresh = thresholds[cutoff_ind]
 
         logger.info('ROC Cutoff: FPR = {:.2f}, TPR = {:.2f}'.format(fpr[cutoff_ind], tpr[cutoff_ind]))
@@ -583,7 +904,7 @@ def process_files(config):
         logger.info('Removing {} peptides for min(PEP) > {:.3f} and CV(PEP) < {:.3f}'.format(np.sum(remove_inds), min_pep_thresh, max_pep_cv_thresh))
 
     remove_seqs = peptides_df.index[remove_inds].values
-    df['remove'] = (df['remove'] | df['sequence'].isin(remove_seqs))
+    remove |= df['sequence'].isin(remove_seqs).values
 
     # filtered_out = remove_seqs['is_decoy'] & (remove_seqs['pep_cv'] < 0.3) & (remove_seqs['pep_min'] > 0.01)
     # print('Removed', np.sum(remove_seqs.loc[filtered_out, 'num_obs']), 'out of', np.sum(remove_seqs.loc[remove_seqs['is_decoy'], 'num_obs']), 'decoy PSMs')
@@ -594,9 +915,9 @@ def process_files(config):
     ## --------------
 
     # flag the observations in df_original that were removed
-    df_original['remove'] = df['remove']
+    df_original['remove'] = remove
     # remove the flagged observations from the dataframe, and reset index
-    df = df[df['remove'] == False].reset_index(drop=True)
+    df = df[~remove].reset_index(drop=True)
 
     # map peptide and experiment IDs
     # sort experiment IDs alphabetically - or else the order is by 
@@ -604,17 +925,11 @@ def process_files(config):
     
     # if experiment or peptide IDs are already provided, then skip this step
     if 'exp_id' not in config['col_names'] or config['col_names']['exp_id'] is None:
-        df['exp_id'] = df['raw_file'].map({
-            ind: val 
-            for val, ind in enumerate(np.sort(df['raw_file'].unique()))
-        })
+        df['exp_id'] = pd.factorize(df['raw_file'], sort=True)[0].astype(np.int32)
     logger.info('{} experiments (raw files) loaded'.format(np.max(df['exp_id'])+1))
 
     if 'peptide_id' not in config['col_names'] or config['col_names']['peptide_id'] is None:
-        df['peptide_id'] = df['sequence'].map({
-            ind: val 
-            for val, ind in enumerate(df['sequence'].unique())
-        })
+        df['peptide_id'] = pd.factorize(df['sequence'])[0].astype(np.int32)
     logger.info('{} peptide sequences loaded'.format(np.max(df['peptide_id'])+1))
 
     # EXCLUSION = PSM does not participate in alignment, but will participate in 
@@ -635,6 +950,10 @@ def process_files(config):
         'exp_id', 'peptide_id', 'input_id', 'id', 'exclude'
     ]]
 
+    # the alignment and update steps expect plain (non-categorical)
+    # raw file and sequence columns
+    df = df.astype({'sequence': object, 'raw_file': object})
+
     # sort by peptide_id, exp_id
     df = df.sort_values(['peptide_id', 'exp_id'])
 
@@ -654,7 +973,7 @@ def main():
     init_logger(config['verbose'], os.path.join(config['output'], 'converter.log'), config['log_file'])
 
     # process all input files (converts and filters)
-    df, df_original = process_files(config)
+    df, df_original = process_files(config, keep_original_columns=False)
     
     #logger.info('{} / {} ({:.2%}) observations pass filters and will be used for alignment'.format(np.sum(~df['exclude']), 
     #    df_original.shape[0], np.sum(~df['exclude']) / df_original.shape[0]))
@@ -664,12 +983,15 @@ def main():
         # if combining input files, then write to one combined file
         out_path = os.path.join(config['output'], config['combined_output_name'])
         logger.info('Combining input file(s) and writing adjusted data file to {} ...'.format(out_path))
-        df.to_csv(out_path, sep='\t', index=False)
+        write_output_file(df, out_path)
     
     if config['save_separate_output']:
         # if keeping input files separate, then use 'input_id' to retain the
         # order in which the input files were passed in
         logger.info('Saving output to separate files...')
+        # get the rows of each input file in one pass, instead of
+        # comparing the whole input_id column once per input file
+        input_rows = df.groupby('input_id', sort=False).indices
         for i, f in enumerate(config['input']):
             out_path = os.path.join(
                 config['output'], 
@@ -679,8 +1001,8 @@ def main():
                 )
             )
             logger.info('Saving input file {} to {}'.format(i, out_path))
-            df_a = df.loc[df['input_id'] == i]
-            df_a.to_csv(out_path, sep='\t', index=False)
+            df_a = df.take(input_rows.get(i, []))
+            write_output_file(df_a, out_path)
 
 if __name__ == '__main__':
     main()
@@ -98,7 +98,7 @@ def main():
     init_logger(args.verbose, '', log_to_file=False)
     logger = logging.getLogger('root')
 
-    df = pd.DataFrame()
+    dfs = []
 
     # iterate through each input file provided.
     for i, f in enumerate(args.input):
@@ -106,11 +106,12 @@ def main():
 
         # load the input file
         dfa = pd.read_csv(f.name, sep='\t', low_memory=False)
-        # append a copy of dfa into df, because the conversion process will heavily
-        # modify dfa. we need to keep a copy of the original dataframe in order to append
-        # the new columns back onto it later.
-        # re-index columns with '[dfa.columns.tolist()]' to preserve the general column order
-        df = df.append(dfa)[dfa.columns.tolist()]
+        # collect the input files and concatenate them once at the end, instead of
+        # appending (and copying the whole dataframe) once per input file
+        dfs.append(dfa)
+
+    # re-index columns with '[dfa.columns.tolist()]' to preserve the general column order
+    df = pd.concat(dfs, ignore_index=True, sort=False)[dfa.columns.tolist()]
 
     df = df.sort_values(by=['Sequence']).reset_index(drop=True)
 
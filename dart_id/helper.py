@@ -272,16 +272,11 @@ def pep_to_fdr(_pep):
     '''Recalculate FDR, based on Spectra PEP and DART PEP
     '''
 
-    pep = _pep.copy()
-    
-    # Make sure no PEPs exceed 1
-    pep.loc[pep > 1] = 1
-    
     # q-value, by fixing # of false positives to a discrete number
-    # For now, set all null PEPs to 1. We'll remember the index and set them back to nan later
-    null_peps = pd.isnull(pep)
-    if null_peps.sum() > 0:
-        pep.loc[null_peps] = 1
+    # Make sure no PEPs exceed 1, and for now, set all null PEPs to 1.
+    # We'll remember the index and set them back to nan later
+    null_peps = pd.isnull(_pep)
+    pep = _pep.clip(upper=1).fillna(1)
     
     # Get the index order of sorted PEPs
     pep_order = np.argsort(pep)
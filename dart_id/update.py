@@ -27,10 +27,8 @@ def update(dfa, params, config):
 
     # refactorize peptide id into stan_peptide_id, 
     # to preserve continuity when feeding data into STAN
-    dfa['stan_peptide_id'] = dfa['sequence'].map({
-        ind: val 
-        for val, ind in enumerate(dfa['sequence'].unique())
-    })
+    # (order of first appearance, same as enumerating the unique sequences)
+    dfa['stan_peptide_id'] = pd.factorize(dfa['sequence'])[0]
 
     num_experiments = dfa['exp_id'].max() + 1
     num_peptides = dfa['peptide_id'].max() + 1
@@ -76,7 +74,7 @@ def update(dfa, params, config):
     dfa['pep'][dfa['pep'] > 1.0] = 1.0
 
     # output table
-    df_new = pd.DataFrame()
+    exps_new = []
 
     bootstrap_method = config['bootstrap_method'] if 'bootstrap_method' in config else None
 
@@ -352,8 +350,8 @@ def update(dfa, params, config):
             'input_id': exp['input_id'].values,
             'exclude': exp['exclude'].values
         })
-        # append to master DataFrame and continue
-        df_new = df_new.append(exp_new)
+        # collect for the master DataFrame and continue
+        exps_new.append(exp_new)
 
         time_append += (time.time() - _time)
 
@@ -370,7 +368,8 @@ def update(dfa, params, config):
         logger.debug('time_append: {:.1f} ms'.format(time_append*1000))
         
 
-    # reorder by ID and reset the index
+    # concatenate once, then reorder by ID and reset the index
+    df_new = pd.concat(exps_new, sort=False)
     df_new = df_new.sort_values('id')
     df_new = df_new.reset_index(drop=True)
 
@@ -503,14 +502,12 @@ def main():
 
     # add dart_PEP column - which is pep_new, with the NaNs filled in
     # with the old PEPs.
-    df_adjusted['dart_PEP'] = df_adjusted['pep_new']
-    df_adjusted['dart_PEP'][pd.isnull(df_adjusted['pep_new'])] = (
-        df_adjusted[config['col_names']['pep']][
-            pd.isnull(df_adjusted['pep_new'])
-        ]
-    )
     # make sure that updated PEP does not exceed 1
-    df_adjusted['dart_PEP'][df_adjusted['dart_PEP'] > 1] = 1
+    df_adjusted['dart_PEP'] = (
+        df_adjusted['pep_new']
+        .fillna(df_adjusted[config['col_names']['pep']])
+        .clip(upper=1)
+    )
 
     # add q-value (FDR) column
     # rank-sorted, cumulative sum of PEPs is expected number of false positives
@@ -528,7 +525,7 @@ def main():
     # For now, set all null PEPs to 1. We'll remember the index and set them back to nan later
     null_peps = pd.isnull(df_adjusted['dart_PEP'])
     if null_peps.sum() > 0:
-        df_adjusted['dart_PEP'][null_peps] = 1
+        df_adjusted['dart_PEP'] = df_adjusted['dart_PEP'].fillna(1)
 
     # Get the index order of sorted PEPs
     pep_order = np.argsort(df_adjusted['dart_PEP'])
@@ -546,8 +543,7 @@ def main():
 
     # Set null PEPs and q-values back to nan
     if null_peps.sum() > 0:
-        df_adjusted['dart_PEP'][null_peps] = np.nan
-        df_adjusted['dart_qval'][null_peps] = np.nan
+        df_adjusted.loc[null_peps, ['dart_PEP', 'dart_qval']] = np.nan
 
     # rename 'remove' column - which indicates whether or not the PSM participated in the
     # DART-ID alignment and update
@@ -631,6 +627,9 @@ def main():
         # if keeping input files separate, then use 'input_id' to retain the
         # order in which the input files were passed in
         logger.info('Saving output to separate files...')
+        # get the rows of each input file in one pass, instead of
+        # comparing the whole input_id column once per input file
+        input_rows = df_adjusted.groupby('input_id', sort=False).indices
         for i, f in enumerate(config['input']):
 
             # get output extension
@@ -662,7 +661,7 @@ def main():
                 )
 
             logger.info('Saving input file {} to {}'.format(i, out_path))
-            df_a = df_adjusted.loc[df_adjusted['input_id'] == i]
+            df_a = df_adjusted.take(input_rows.get(i, []))
             # save to file
             # other data formats might have a different separator, or have an index column
             write_output(df_a, out_path, config)
@@ -74,7 +74,10 @@ setup(
   #  'pytest'
   #],
   extras_require={
-
+    # faster matching of the UniProt exclusion list filter,
+    # and faster parsing and writing of input and output files.
+    # pyarrow >= 8 is needed for the quoting_style option of its CSV writer
+    'fast': ['pyahocorasick', 'pyarrow>=8']
   },
   include_package_data=True,
   # specified in MANIFEST.in instead